@@ -11,14 +11,45 @@ Configuration is taken from environment variables (see below).
 No secrets or personal data are hardcoded – the GitHub token, name/email, user/org mode, etc.
 """
 
+import asyncio
+import atexit
+import hashlib
+import hmac
+import logging
 import os
+import queue
+import re
+import secrets
 import sys
 import time
-import requests
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from urllib.parse import urlencode
+
+import httpx
+import orjson
+
+# Log records are queued and written to stdout by a background thread, so concurrent
+# tasks never block on the console. The listener is stopped (and flushed) at exit.
+# Only this script's logger is configured (not the root logger), so library request
+# logs, which would reveal private repo names in URLs, stay hidden.
+_log_queue = queue.SimpleQueue()
+log = logging.getLogger("dependency-fix")
+log.setLevel(logging.INFO)
+log.addHandler(QueueHandler(_log_queue))
+log.propagate = False
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter("%(message)s"))
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
+_TRUTHY = frozenset({"true", "1", "yes", "on", "y", "t"})
 
 def str_to_bool(val):
     """Utility to convert environment string (e.g. 'true'/'false') to boolean."""
-    return str(val).lower() in ["true", "1", "yes"]
+    return str(val).lower() in _TRUTHY
 
 def safe_repo_name(repo):
     """
@@ -41,14 +72,26 @@ EXCLUDED_REPOS_FILE = os.environ.get("EXCLUDED_REPOS_FILE", "excluded_repos.txt"
 INCLUDED_REPOS_FILE = os.environ.get("INCLUDED_REPOS_FILE", "included_repos.txt")
 
 if not GITHUB_TOKEN:
-    print("ERROR: Missing environment variable MY_GITHUB_TOKEN. Exiting.")
+    log.error("ERROR: Missing environment variable MY_GITHUB_TOKEN. Exiting.")
     sys.exit(1)
 
 BASE_URL = "https://api.github.com"
+GRAPHQL_URL = f"{BASE_URL}/graphql"
 HEADERS = {
     "Accept": "application/vnd.github+json",
     "Authorization": f"Bearer {GITHUB_TOKEN}"
 }
+# Extra headers for requests whose body is pre-encoded JSON.
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# HTTP status codes the script checks for.
+OK = 200
+CREATED = 201
+OK_NO_CONTENT = 204
+NOT_MODIFIED = 304
+FORBIDDEN = 403
+TOO_MANY_REQUESTS = 429
+SERVER_ERROR = 500
 
 ENABLE_STEP_SYNC_FORKS = str_to_bool(os.environ.get("ENABLE_STEP_SYNC_FORKS", "true"))
 ENABLE_STEP_ENABLE_DEPENDABOT = str_to_bool(os.environ.get("ENABLE_STEP_ENABLE_DEPENDABOT", "true"))
@@ -60,30 +103,101 @@ MERGE_METHOD = os.environ.get("MERGE_METHOD", "merge")
 
 COUNT_MERGES_AS_PERSONAL_COMMITS = str_to_bool(os.environ.get("COUNT_MERGES_AS_PERSONAL_COMMITS", "true"))
 
+# Optional webhook mode: when WEBHOOK_URL (a public URL forwarded to WEBHOOK_PORT on this
+# machine) is set, PRs waiting for CI are re-checked when GitHub sends an event instead of
+# every POLL_INTERVAL_SECONDS.
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8080"))
+
+# ETags of GET responses (with the parts of the body the script reads) are kept here so
+# later runs can make conditional requests.
+ETAG_CACHE_FILE = os.path.expanduser(os.environ.get("ETAG_CACHE_FILE", "~/.cache/dep-fix/etags.json"))
+# Per-repo results of previous runs, used to skip repos that haven't been pushed to since.
+STATE_FILE = os.path.expanduser(os.environ.get("STATE_FILE", "~/.cache/dep-fix/state.json"))
+
+# Check-run conclusions that mean a PR must not be merged.
+FAILING_CONCLUSIONS = frozenset({"failure", "timed_out", "cancelled", "action_required", "startup_failure"})
+
+# Extracts the page number of the rel="last" entry in a GitHub "Link" pagination header.
+LAST_PAGE_PATTERN = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+# Maximum number of repositories processed concurrently (also the per-host connection cap).
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "64"))
+# Maximum number of Dependabot PRs of a single repository handled concurrently.
+PR_CONCURRENCY_PER_REPO = 8
+
+# Timeout (in seconds) for a single HTTP request.
+HTTP_TIMEOUT_SECONDS = 30
+# How long an idle connection is kept open. This is longer than POLL_INTERVAL_SECONDS so
+# polling reuses the existing connection instead of paying DNS + TLS setup again.
+KEEPALIVE_EXPIRY_SECONDS = 75
+
+# When fewer than this many primary rate-limit requests remain, wait for the window to reset.
+RATE_LIMIT_RESERVE = 100
+# Delays (in seconds) between retries of rate-limited or failed (5xx / network error) requests.
+RETRY_BACKOFF_SECONDS = (1, 2, 4, 8, 16, 32)
+# Requests that are safe to send again after a 5xx or a dropped connection, because
+# repeating them can't act twice. Other calls (merges, fork syncs, creating hooks) are
+# only retried when GitHub never received them.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "DELETE"})
+
 # ----------------------------------------------------- #
 
+def _load_json_file(file_path, what):
+    """
+    Reads a JSON object persisted by a previous run. Returns {} if the file
+    is missing or unreadable (`what` names it in the warning).
+    """
+    try:
+        with open(file_path, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable {what} at {file_path}: {e}")
+        return {}
+
+def _save_json_file(file_path, data, what):
+    """Writes `data` as JSON, creating parent directories as needed."""
+    try:
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(orjson.dumps(data))
+    except OSError as e:
+        log.warning(f"Could not write {what} to {file_path}: {e}")
+
+# ----------------------------------------------------- #
+
+def _load_repo_list(file_path):
+    """
+    Reads "owner/repo" lines from file_path into a frozenset, ignoring empty lines
+    and lines starting with '#'. Returns None if the file does not exist.
+    """
+    try:
+        text = Path(file_path).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    return frozenset(
+        line for line in map(str.strip, text.splitlines())
+        if line and not line.startswith("#")
+    )
+
 def load_included_repos(file_path):
     """
     Reads lines from an 'included_repos.txt' file, returning a set of "owner/repo" that should be processed.
     Ignores empty lines and lines starting with '#'.
     """
-    included = set()
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                included.add(line)
-    except FileNotFoundError:
-        print(f"No inclusion file found at: {file_path}. Proceeding with all repositories.")
+    included = _load_repo_list(file_path)
+    if included is None:
+        log.info(f"No inclusion file found at: {file_path}. Proceeding with all repositories.")
+        return frozenset()
     return included
 
 # In your main() function or after listing repos, filter by inclusion if provided:
 def filter_repos_by_inclusion(repos, included):
     if not included:
         return repos
-    filtered = [r for r in repos if f"{r['owner']['login']}/{r['name']}" in included]
+    filtered = [r for r in repos if r.full_name in included]
     return filtered
 
 # ----------------------------------------------------- #
@@ -93,216 +207,629 @@ def load_excluded_repos(file_path):
     Reads lines from 'excluded_repos.txt', returning a set of repos to skip.
     Format: "owner/repo" per line. Ignores empty/comment lines.
     """
-    excluded = set()
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                excluded.add(line)
-    except FileNotFoundError:
-        print(f"No exclusion file found at: {file_path}. Proceeding without exclusions.")
+    excluded = _load_repo_list(file_path)
+    if excluded is None:
+        log.info(f"No exclusion file found at: {file_path}. Proceeding without exclusions.")
+        return frozenset()
     return excluded
 
+# ============== GITHUB API CLIENT ============== #
+
+class GitHubClient:
+    """
+    Wraps an httpx.AsyncClient so that every API call honours GitHub's rate limits.
+    Responses are inspected for X-RateLimit-Remaining / X-RateLimit-Reset and Retry-After;
+    when a limit is hit, all concurrent tasks are paused until it is safe to continue.
+    GET requests for JSON resources are made conditional using cached ETags.
+    """
+
+    def __init__(self, http_client, etag_cache_file=None):
+        self._http = http_client
+        # Cleared while a rate-limit pause is in effect; every request waits on it.
+        self._gate = asyncio.Event()
+        self._gate.set()
+        # Maps a request URL (with query string) to {"etag", "body", "link"} of its last 200 response.
+        self._etag_cache_file = etag_cache_file
+        self._etags = _load_json_file(etag_cache_file, "ETag cache") if etag_cache_file else {}
+        # The entries requested during this run; only these are saved, so resources
+        # that are gone (merged PRs, old commits' check runs) drop out of the cache.
+        self._used_etags = {}
+
+    def save_etags(self):
+        """Persists the ETag cache entries used in this run so the next run can reuse them."""
+        if self._etag_cache_file:
+            _save_json_file(self._etag_cache_file, self._used_etags, "ETag cache")
+
+    async def _pause(self, seconds):
+        """Blocks all requests for `seconds` (or joins a pause already in progress)."""
+        if not self._gate.is_set():
+            await self._gate.wait()
+            return
+        self._gate.clear()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._gate.set()
+
+    @staticmethod
+    def _seconds_until_reset(headers):
+        reset = headers.get("X-RateLimit-Reset")
+        if reset is None:
+            return None
+        return max(int(reset) - time.time(), 0) + 1
+
+    @staticmethod
+    def _is_rate_limited(resp):
+        if resp.status_code == TOO_MANY_REQUESTS:
+            return True
+        if resp.status_code != FORBIDDEN:
+            return False
+        if "Retry-After" in resp.headers or resp.headers.get("X-RateLimit-Remaining") == "0":
+            return True
+        # Secondary rate limits are reported as a 403 with an explanatory message.
+        return "rate limit" in resp.text.lower()
+
+    async def request(self, method, url, idempotent=None, **kwargs):
+        """
+        Performs a request and returns the (fully read) response.
+        Rate-limited responses are retried with exponential backoff. 5xx responses and
+        network errors are retried too if the request is idempotent (by default GET,
+        HEAD and DELETE); connection failures always are, since nothing was sent.
+        The last response (or error) is returned if all retries are exhausted.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        for delay in RETRY_BACKOFF_SECONDS + (None,):
+            await self._gate.wait()
+            try:
+                resp = await self._http.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except httpx.TransportError:
+                if delay is None or not idempotent:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+
+            if delay is not None and self._is_rate_limited(resp):
+                retry_after = resp.headers.get("Retry-After")
+                if retry_after is not None:
+                    wait = int(retry_after)
+                elif resp.headers.get("X-RateLimit-Remaining") == "0":
+                    wait = self._seconds_until_reset(resp.headers) or delay
+                else:
+                    wait = delay
+                log.warning(f"⏳  Rate limited by GitHub. Pausing all requests for {wait:.0f}s...")
+                await self._pause(wait)
+                continue
+
+            if delay is not None and idempotent and resp.status_code >= SERVER_ERROR:
+                await asyncio.sleep(delay)
+                continue
+
+            remaining = int(resp.headers.get("X-RateLimit-Remaining", "9999"))
+            if remaining < RATE_LIMIT_RESERVE:
+                wait = self._seconds_until_reset(resp.headers)
+                if wait:
+                    log.warning(f"⏳  Only {remaining} API requests left. Pausing until the rate limit resets ({wait:.0f}s)...")
+                    await self._pause(wait)
+            return resp
+
+    async def get_json(self, url, params=None, keep=None):
+        """
+        GET a JSON resource and return (body, Link header).
+        Sends If-None-Match when the URL has been fetched before; a 304 reply
+        (which does not count against the rate limit) is served from the cache.
+        `keep`, if given, reduces the body to the fields the caller reads, so
+        only those are returned and cached.
+        """
+        key = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+        cached = self._etags.get(key)
+        headers = {"If-None-Match": cached["etag"]} if cached else None
+
+        resp = await self.request("GET", url, params=params, headers=headers)
+        if resp.status_code == NOT_MODIFIED and cached:
+            self._used_etags[key] = cached
+            return cached["body"], cached["link"]
+        resp.raise_for_status()
+
+        body = orjson.loads(resp.content)
+        if keep:
+            body = keep(body)
+        link = resp.headers.get("Link", "")
+        etag = resp.headers.get("ETag")
+        if etag:
+            self._etags[key] = self._used_etags[key] = {"etag": etag, "body": body, "link": link}
+        return body, link
+
 # ============== STEP 0: LIST REPOS ============== #
 
-def list_repos():
+@dataclass(slots=True)
+class RepoRec:
     """
-    Returns a list of repositories where this token has push (write) access.
-    Paginates beyond 100 repos as needed.
+    The fields of a GitHub repository the steps need, extracted once after listing.
+    `full_name` ("owner/repo") is used for matching; `display_name` masks private repos for printing.
     """
-    all_repos = []
-    page = 1
+    full_name: str
+    owner: str
+    name: str
+    fork: bool
+    default_branch: str
+    parent_url: str | None
+    private: bool
+    display_name: str
+    pushed_at: str | None
 
-    while True:
-        if USER_MODE:
-            url = f"{BASE_URL}/user/repos"
-            params = {"per_page": 100, "page": page}
-        else:
-            url = f"{BASE_URL}/orgs/{ORG_NAME}/repos"
-            params = {"per_page": 100, "page": page, "type": "all"}
+    @classmethod
+    def from_api(cls, repo):
+        owner = repo["owner"]["login"]
+        return cls(
+            full_name=f"{owner}/{repo['name']}",
+            owner=owner,
+            name=repo["name"],
+            fork=repo["fork"],
+            default_branch=repo["default_branch"],
+            parent_url=repo["parent"]["html_url"] if "parent" in repo else None,
+            private=bool(repo.get("private")),
+            display_name=safe_repo_name(repo),
+            pushed_at=repo.get("pushed_at")
+        )
+
+def _repo_fields(repo):
+    """The fields of a listed repo that from_api() and iter_repos() read (all that is cached)."""
+    fields = {key: repo.get(key) for key in ("name", "fork", "default_branch", "private", "pushed_at")}
+    fields["owner"] = {"login": repo["owner"]["login"]}
+    fields["permissions"] = {"push": repo.get("permissions", {}).get("push", False)}
+    if "parent" in repo:
+        fields["parent"] = {"html_url": repo["parent"]["html_url"]}
+    return fields
 
-        resp = requests.get(url, headers=HEADERS, params=params)
-        if resp.status_code != 200:
-            print(f"Error listing repos: {resp.status_code} {resp.text}")
-            break
+def _open_pr_fields(pr):
+    """The fields of a listed PR that the REST fallback in step 3 reads."""
+    return {"number": pr["number"], "title": pr["title"],
+            "head": {"sha": pr["head"]["sha"]}, "user": {"login": pr["user"]["login"]}}
 
-        repos_page = resp.json()
-        if not repos_page:
-            break
+def _pr_detail_fields(pr):
+    """The fields of a single PR that wait_for_mergeability() reads."""
+    return {"mergeable_state": pr["mergeable_state"], "head": {"sha": pr["head"]["sha"]}}
 
-        all_repos.extend(repos_page)
+def _check_run_fields(data):
+    """The conclusions of a commit's check runs (the only part of them that is read)."""
+    return {"check_runs": [{"conclusion": run["conclusion"]} for run in data.get("check_runs", [])]}
+
+async def iter_pages(client, url, params, keep_item=None):
+    """
+    Yields the items of each page of a paginated GET endpoint as soon as that page arrives.
+    Page 1 is fetched first; its Link header tells us the last page, so the
+    remaining pages are requested concurrently and yielded in completion order.
+    `params` must include "per_page". `keep_item` reduces each item to the fields used.
+    """
+    per_page = params.get("per_page", 30)
+    keep = (lambda items: [keep_item(item) for item in items]) if keep_item else None
+    items, link = await client.get_json(url, params={**params, "page": 1}, keep=keep)
+    yield items
+    # A short page is always the last one, so there is nothing more to request.
+    if len(items) < per_page:
+        return
+
+    match = LAST_PAGE_PATTERN.search(link)
+    if match:
+        last_page = int(match.group(1))
+        pages = [asyncio.ensure_future(client.get_json(url, params={**params, "page": p}, keep=keep))
+                 for p in range(2, last_page + 1)]
+        try:
+            for next_page in asyncio.as_completed(pages):
+                items, _ = await next_page
+                yield items
+        finally:
+            # If a page failed (or the caller stopped early), don't leave the other
+            # requests running unawaited.
+            for task in pages:
+                task.cancel()
+            await asyncio.gather(*pages, return_exceptions=True)
+        return
+
+    # No Link header to tell us the page count: walk pages until a short one.
+    page = 2
+    while True:
+        items, _ = await client.get_json(url, params={**params, "page": page}, keep=keep)
+        yield items
+        if len(items) < per_page:
+            return
         page += 1
 
-    # Filter to repos where the token has push permission
-    writable_repos = [
-        r for r in all_repos
-        if r.get("permissions", {}).get("push", False)
-    ]
-    return writable_repos
+async def get_all_pages(client, url, params, keep_item=None):
+    """
+    Fetches every page of a paginated GET endpoint and returns the concatenated items.
+    """
+    return [item async for page in iter_pages(client, url, params, keep_item) for item in page]
+
+async def iter_repos(client):
+    """
+    Yields lists of RepoRec for repositories where this token has push (write) access,
+    one list per page of 100 repos, so callers can start working before listing finishes.
+    """
+    if USER_MODE:
+        url = f"{BASE_URL}/user/repos"
+        params = {"per_page": 100}
+    else:
+        url = f"{BASE_URL}/orgs/{ORG_NAME}/repos"
+        params = {"per_page": 100, "type": "all"}
+
+    try:
+        async for page in iter_pages(client, url, params, keep_item=_repo_fields):
+            # Filter to repos where the token has push permission
+            yield [
+                RepoRec.from_api(r) for r in page
+                if r.get("permissions", {}).get("push", False)
+            ]
+    except httpx.HTTPStatusError as e:
+        log.error(f"Error listing repos: {e.response.status_code} {e.response.text}")
 
 # ============== STEP 1: SYNC FORKS ============== #
 
-def sync_fork(owner, repo_name, branch):
+async def sync_fork(client, owner, repo_name, branch):
     """
     POST /repos/{owner}/{repo}/merge-upstream to sync a fork with upstream changes.
     """
     url = f"{BASE_URL}/repos/{owner}/{repo_name}/merge-upstream"
     data = {"branch": branch}
-    resp = requests.post(url, headers=HEADERS, json=data)
-
-    if resp.status_code == 200:
-        json_resp = resp.json()
-        print(f"✔️  Synced fork {owner}/{repo_name} (branch '{branch}'), merge commit: {json_resp.get('merge_commit_sha')}")
+    resp = await client.request("POST", url, content=orjson.dumps(data), headers=JSON_HEADERS)
+    if resp.status_code == OK:
+        json_resp = orjson.loads(resp.content)
+        log.info(f"✔️  Synced fork {owner}/{repo_name} (branch '{branch}'), merge commit: {json_resp.get('merge_commit_sha')}")
     else:
-        print(f"❌  Failed to sync fork {owner}/{repo_name}. Status: {resp.status_code} {resp.text}")
+        log.error(f"❌  Failed to sync fork {owner}/{repo_name}. Status: {resp.status_code} {resp.text}")
 
-def step_sync_forks(repos, excluded):
+async def step_sync_forks(client, repos, excluded, sem):
     """
     For each repo that is a fork, attempt to sync from upstream.
-    Private repo names are masked.
-    """
-    print("\n=== STEP 1: SYNC FORKS ===")
-    for r in repos:
-        display_name = safe_repo_name(r)
-        full_name = f"{r['owner']['login']}/{r['name']}"
-        if full_name in excluded:
-            print(f"Skipping fork sync for {display_name} (excluded).")
-            continue
+    Private repo names are masked. `sem` bounds how many repos are processed at once.
+    """
+    repos_to_sync = [r for r in repos if r.fork and r.full_name not in excluded]
+    excluded_count = sum(1 for r in repos if r.full_name in excluded)
+    non_fork_count = len(repos) - len(repos_to_sync) - excluded_count
+    if non_fork_count or excluded_count:
+        log.info(f"Skipping fork sync for {non_fork_count} non-fork / {excluded_count} excluded repos.")
 
-        if r["fork"]:
-            owner = r["owner"]["login"]
-            repo_name = r["name"]
-            default_branch = r["default_branch"]  # e.g. main, master, etc.
-            parent_html_url = r["parent"]["html_url"] if "parent" in r else None
+    async def process_repo(r):
+        log.info(f"Repo {r.display_name} is a fork of {r.parent_url}. Syncing default branch '{r.default_branch}'...")
+        async with sem:
+            try:
+                await sync_fork(client, r.owner, r.name, r.default_branch)
+            except httpx.HTTPError as e:
+                # One repo's network error shouldn't abort the other repos.
+                log.error(f"❌  Failed to sync fork {r.display_name}: {e!r}")
 
-            print(f"Repo {display_name} is a fork of {parent_html_url}. Syncing default branch '{default_branch}'...")
-            sync_fork(owner, repo_name, default_branch)
-        else:
-            print(f"Repo {display_name} is not a fork. Skipping fork sync.")
+    await asyncio.gather(*[process_repo(r) for r in repos_to_sync])
 
 # ============== STEP 2: ENABLE DEPENDABOT SECURITY UPDATES ============== #
 
-def enable_vulnerability_alerts(owner, repo_name, display_name):
+async def enable_vulnerability_alerts(client, owner, repo_name, display_name):
     """
-    PUT /repos/{owner}/{repo}/vulnerability-alerts.
+    PUT /repos/{owner}/{repo}/vulnerability-alerts. Returns True on success.
     """
     url = f"{BASE_URL}/repos/{owner}/{repo_name}/vulnerability-alerts"
-    resp = requests.put(url, headers=HEADERS)
-    if resp.status_code == 204:
-        print(f"✔️  Enabled vulnerability alerts on {display_name}")
-    else:
-        print(f"❌  Failed to enable vulnerability alerts on {display_name}: {resp.status_code} {resp.text}")
+    resp = await client.request("PUT", url, idempotent=True)
+    if resp.status_code == OK_NO_CONTENT:
+        log.info(f"✔️  Enabled vulnerability alerts on {display_name}")
+        return True
+    log.error(f"❌  Failed to enable vulnerability alerts on {display_name}: {resp.status_code} {resp.text}")
+    return False
 
-def enable_automated_security_fixes(owner, repo_name, display_name):
+async def enable_automated_security_fixes(client, owner, repo_name, display_name, log_failure=True):
     """
-    PUT /repos/{owner}/{repo}/automated-security-fixes.
+    PUT /repos/{owner}/{repo}/automated-security-fixes. Returns True on success.
+    With log_failure=False a failure is not logged (the caller will retry or report it).
     """
     url = f"{BASE_URL}/repos/{owner}/{repo_name}/automated-security-fixes"
-    resp = requests.put(url, headers=HEADERS)
-    if resp.status_code == 204:
-        print(f"✔️  Enabled automated security fixes on {display_name}")
-    else:
-        print(f"❌  Failed to enable automated security fixes on {display_name}: {resp.status_code} {resp.text}")
+    resp = await client.request("PUT", url, idempotent=True)
+    if resp.status_code == OK_NO_CONTENT:
+        log.info(f"✔️  Enabled automated security fixes on {display_name}")
+        return True
+    if log_failure:
+        log.error(f"❌  Failed to enable automated security fixes on {display_name}: {resp.status_code} {resp.text}")
+    return False
 
-def step_enable_dependabot_security_updates(repos, excluded):
+async def step_enable_dependabot_security_updates(client, repos, excluded, sem):
     """
     Enables vulnerability alerts and automated security fixes for each repo.
-    Private repo names are masked.
-    """
-    print("\n=== STEP 2: ENABLE DEPENDABOT SECURITY UPDATES ===")
-    for r in repos:
-        display_name = safe_repo_name(r)
-        full_name = f"{r['owner']['login']}/{r['name']}"
-        if full_name in excluded:
-            print(f"Skipping Dependabot setup for {display_name} (excluded).")
-            continue
-        owner = r["owner"]["login"]
-        repo_name = r["name"]
-        print(f"\n[Enabling Dependabot for] {display_name}")
-        enable_vulnerability_alerts(owner, repo_name, display_name)
-        enable_automated_security_fixes(owner, repo_name, display_name)
-        
+    Private repo names are masked. `sem` bounds how many repos are processed at once.
+    Returns the full names of the repos where both were enabled.
+    """
+    repos_to_enable = [r for r in repos if r.full_name not in excluded]
+    if len(repos_to_enable) < len(repos):
+        log.info(f"Skipping Dependabot setup for {len(repos) - len(repos_to_enable)} excluded repos.")
+
+    async def process_repo(r):
+        async with sem:
+            log.info(f"\n[Enabling Dependabot for] {r.display_name}")
+            try:
+                # Both requests are sent at once. Automated security fixes require vulnerability
+                # alerts, so if that request lost the race it is retried once alerts are on;
+                # only the outcome of the last attempt is logged.
+                alerts_enabled, fixes_enabled = await asyncio.gather(
+                    enable_vulnerability_alerts(client, r.owner, r.name, r.display_name),
+                    enable_automated_security_fixes(client, r.owner, r.name, r.display_name, log_failure=False)
+                )
+                if not fixes_enabled:
+                    if alerts_enabled:
+                        fixes_enabled = await enable_automated_security_fixes(client, r.owner, r.name, r.display_name)
+                    else:
+                        log.error(f"❌  Failed to enable automated security fixes on {r.display_name}: vulnerability alerts are not enabled.")
+            except httpx.HTTPError as e:
+                log.error(f"❌  Failed to enable Dependabot on {r.display_name}: {e!r}")
+                return False
+            return alerts_enabled and fixes_enabled
+
+    results = await asyncio.gather(*[process_repo(r) for r in repos_to_enable])
+    return {r.full_name for r, enabled in zip(repos_to_enable, results) if enabled}
+
+# ============== WEBHOOKS (OPTIONAL) ============== #
+
+class WebhookListener:
+    """
+    Receives GitHub check_suite / pull_request webhooks so that PRs waiting for CI
+    are re-checked as soon as something changes, instead of on a fixed poll interval.
+    A temporary hook is registered on each repo that needs it and removed in stop().
+    Raises ImportError if aiohttp (only needed for this mode) is not installed.
+    """
+
+    def __init__(self, client, public_url, port):
+        from aiohttp import web
+        self._web = web
+        self._client = client
+        self._public_url = public_url
+        self._port = port
+        self._secret = secrets.token_hex(32)
+        self._runner = None
+        # (owner/repo, PR number) -> Event set whenever a webhook mentions that PR.
+        self._events = {}
+        # owner/repo -> Task registering its hook (resolves to the hook id, or None on failure).
+        self._hooks = {}
+
+    async def start(self):
+        app = self._web.Application()
+        app.router.add_post("/", self._handle)
+        self._runner = self._web.AppRunner(app)
+        await self._runner.setup()
+        await self._web.TCPSite(self._runner, port=self._port).start()
+        log.info(f"Listening for GitHub webhooks on port {self._port} ({self._public_url}).")
+
+    async def stop(self):
+        """
+        Deletes the temporary hooks and shuts the listener down. Failures are logged,
+        so one hook that can't be removed doesn't keep the others registered.
+        """
+        for full_name, task in list(self._hooks.items()):
+            try:
+                hook_id = await task
+                if hook_id is not None:
+                    await self._client.request("DELETE", f"{BASE_URL}/repos/{full_name}/hooks/{hook_id}")
+            except (httpx.HTTPError, KeyError, ValueError) as e:
+                log.warning(f"Could not remove a temporary webhook: {e!r}")
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _register(self, full_name):
+        url = f"{BASE_URL}/repos/{full_name}/hooks"
+        body = orjson.dumps({
+            "name": "web",
+            "active": True,
+            "events": ["check_suite", "pull_request"],
+            "config": {"url": self._public_url, "content_type": "json", "secret": self._secret}
+        })
+        resp = await self._client.request("POST", url, content=body, headers=JSON_HEADERS)
+        if resp.status_code == CREATED:
+            return orjson.loads(resp.content)["id"]
+        log.warning(f"Could not register webhook ({resp.status_code}); falling back to polling for this repo.")
+        return None
+
+    async def watch(self, owner, repo, pr_number):
+        """
+        Makes sure events for the PR are being collected. Returns False if the
+        repo's webhook could not be registered (the caller should poll instead).
+        """
+        full_name = f"{owner}/{repo}"
+        if full_name not in self._hooks:
+            self._hooks[full_name] = asyncio.ensure_future(self._register(full_name))
+        self._events.setdefault((full_name, pr_number), asyncio.Event())
+        # Shielded: cancelling one waiting PR must not cancel the registration that
+        # stop() still needs to await (and undo).
+        return await asyncio.shield(self._hooks[full_name]) is not None
+
+    async def wait(self, owner, repo, pr_number, timeout):
+        """Waits until a webhook mentions the PR. Returns False if `timeout` passes first."""
+        event = self._events.setdefault((f"{owner}/{repo}", pr_number), asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        event.clear()
+        return True
+
+    async def _handle(self, request):
+        body = await request.read()
+        expected = "sha256=" + hmac.new(self._secret.encode(), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, request.headers.get("X-Hub-Signature-256", "")):
+            return self._web.Response(status=401)
+
+        payload = orjson.loads(body)
+        full_name = payload.get("repository", {}).get("full_name")
+        event_name = request.headers.get("X-GitHub-Event")
+        if event_name == "check_suite":
+            pr_numbers = [pr["number"] for pr in payload["check_suite"].get("pull_requests", [])]
+        elif event_name == "pull_request":
+            pr_numbers = [payload["pull_request"]["number"]]
+        else:
+            pr_numbers = []  # e.g. the "ping" sent when a hook is created
+
+        for pr_number in pr_numbers:
+            event = self._events.get((full_name, pr_number))
+            if event:
+                event.set()
+        return self._web.Response(status=OK_NO_CONTENT)
+
 # ============== STEP 3: MERGE DEPENDABOT PRs ============== #
 
-def get_open_prs(owner, repo):
+async def get_open_prs(client, owner, repo):
     """
     Lists open pull requests, sorted by creation date (ascending), with pagination.
     """
-    all_prs = []
-    page = 1
-    while True:
-        url = f"{BASE_URL}/repos/{owner}/{repo}/pulls"
-        params = {
-            "state": "open",
-            "sort": "created",
-            "direction": "asc",
-            "per_page": 100,
-            "page": page
+    url = f"{BASE_URL}/repos/{owner}/{repo}/pulls"
+    params = {
+        "state": "open",
+        "sort": "created",
+        "direction": "asc",
+        "per_page": 100
+    }
+    return await get_all_pages(client, url, params, keep_item=_open_pr_fields)
+
+# Fetches open PRs (100 per page, after the cursor $after) together with their merge state
+# and the checks of the head commit, so a repo's Dependabot PRs can be triaged without
+# a request per PR.
+DEPENDABOT_PRS_QUERY = """
+query($owner: String!, $name: String!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: 100, after: $after, states: OPEN, orderBy: {field: CREATED_AT, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        author { login }
+        mergeStateStatus
+        headRefOid
+        commits(last: 1) {
+          nodes {
+            commit {
+              statusCheckRollup { state }
+              checkSuites(first: 10) {
+                nodes { checkRuns(first: 50) { nodes { conclusion } } }
+              }
+            }
+          }
         }
-        resp = requests.get(url, headers=HEADERS, params=params)
-        resp.raise_for_status()
-        data_page = resp.json()
-        if not data_page:
-            break
-        all_prs.extend(data_page)
-        page += 1
-    return all_prs
+      }
+    }
+  }
+}
+"""
 
-def get_pr_details(owner, repo, pr_number):
-    url = f"{BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
-    resp = requests.get(url, headers=HEADERS)
+async def graphql_query(client, query, variables):
+    """
+    POST /graphql and return the decoded response (including any "errors").
+    """
+    payload = orjson.dumps({"query": query, "variables": variables})
+    # Only queries are sent, so the request is safe to repeat.
+    resp = await client.request("POST", GRAPHQL_URL, content=payload, headers=JSON_HEADERS, idempotent=True)
     resp.raise_for_status()
-    return resp.json()
+    return orjson.loads(resp.content)
 
-def get_check_runs(owner, repo, commit_sha):
+async def get_dependabot_prs(client, owner, repo):
+    """
+    Returns open Dependabot PRs as dicts with "number", "title", "merge_state"
+    (GraphQL mergeStateStatus), "conclusions" (check runs of the head commit) and
+    "checks_pending" (some checks of the head commit have not finished yet).
+    Returns None if the GraphQL query fails, so callers can fall back to REST.
+    """
+    dependabot_prs = []
+    variables = {"owner": owner, "name": repo, "after": None}
+    while True:
+        result = await graphql_query(client, DEPENDABOT_PRS_QUERY, variables)
+        if result.get("errors"):
+            log.error(f"GraphQL query for Dependabot PRs failed: {result['errors']}")
+            return None
+
+        pull_requests = result["data"]["repository"]["pullRequests"]
+        for node in pull_requests["nodes"]:
+            # GraphQL reports bot authors without the "[bot]" suffix used by REST.
+            if (node.get("author") or {}).get("login") != "dependabot":
+                continue
+            commits = [commit["commit"] for commit in node["commits"]["nodes"]]
+            # A run that hasn't finished has no conclusion yet (None).
+            conclusions = [
+                run["conclusion"].lower() if run["conclusion"] else None
+                for commit in commits
+                for suite in commit["checkSuites"]["nodes"]
+                for run in suite["checkRuns"]["nodes"]
+            ]
+            checks_pending = None in conclusions or any(
+                (commit["statusCheckRollup"] or {}).get("state") in ("PENDING", "EXPECTED")
+                for commit in commits
+            )
+            dependabot_prs.append({
+                "number": node["number"],
+                "title": node["title"],
+                "merge_state": node["mergeStateStatus"],
+                "head_sha": node["headRefOid"],
+                "conclusions": conclusions,
+                "checks_pending": checks_pending
+            })
+
+        if not pull_requests["pageInfo"]["hasNextPage"]:
+            return dependabot_prs
+        variables["after"] = pull_requests["pageInfo"]["endCursor"]
+
+async def get_pr_details(client, owner, repo, pr_number):
+    url = f"{BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+    pr_data, _ = await client.get_json(url, keep=_pr_detail_fields)
+    return pr_data
+
+async def get_check_runs(client, owner, repo, commit_sha):
     """
     Returns check runs for a given commit.
     """
     url = f"{BASE_URL}/repos/{owner}/{repo}/commits/{commit_sha}/check-runs"
-    resp = requests.get(url, headers=HEADERS)
-    resp.raise_for_status()
-    return resp.json().get("check_runs", [])
+    data, _ = await client.get_json(url, keep=_check_run_fields)
+    return data["check_runs"]
 
-def wait_for_mergeability(owner, repo, pr_number, timeout=TIMEOUT_SECONDS, poll_interval=POLL_INTERVAL_SECONDS):
+async def wait_for_mergeability(client, owner, repo, pr_number, head_sha=None, timeout=TIMEOUT_SECONDS, poll_interval=POLL_INTERVAL_SECONDS, webhooks=None):
     """
     Polls until the PR is mergeable (mergeable_state == 'clean'),
     or failing checks appear, or it times out.
+    With a WebhookListener, each re-check waits for a webhook about the PR instead of poll_interval.
     Returns True if mergeable, False otherwise.
     """
     start_time = time.time()
+    use_webhooks = webhooks is not None and await webhooks.watch(owner, repo, pr_number)
     while True:
-        pr_data = get_pr_details(owner, repo, pr_number)
-        mergeable_state = pr_data["mergeable_state"]
-        head_sha = pr_data["head"]["sha"]
-
-        # Check for failing checks
-        failing_runs = [
-            run for run in get_check_runs(owner, repo, head_sha)
-            if run["conclusion"] in ["failure", "timed_out"]
-        ]
-        if failing_runs:
-            print(f"❌  PR #{pr_number} has failing checks. Skipping merge.")
+        # Check runs are looked at first: one failing run means the PR can't
+        # become mergeable, so there is no need to fetch the PR itself.
+        if head_sha and any(run["conclusion"] in FAILING_CONCLUSIONS for run in await get_check_runs(client, owner, repo, head_sha)):
+            log.error(f"❌  PR #{pr_number} has failing checks. Skipping merge.")
             return False
 
+        pr_data = await get_pr_details(client, owner, repo, pr_number)
+        mergeable_state = pr_data["mergeable_state"]
+        if pr_data["head"]["sha"] != head_sha:
+            # New (or not yet known) head commit: check its runs before trusting the state.
+            head_sha = pr_data["head"]["sha"]
+            continue
+
         if mergeable_state == "clean":
-            print(f"✔️  PR #{pr_number} is mergeable (clean).")
+            log.info(f"✔️  PR #{pr_number} is mergeable (clean).")
             return True
 
         elapsed = time.time() - start_time
         if elapsed > timeout:
-            print(f"⏱️  Timed out waiting for PR #{pr_number} to become 'clean'. Final state: '{mergeable_state}'.")
+            log.warning(f"⏱️  Timed out waiting for PR #{pr_number} to become 'clean'. Final state: '{mergeable_state}'.")
             return False
 
-        print(f"⏳  Waiting for PR #{pr_number}... (mergeable_state='{mergeable_state}')")
-        time.sleep(poll_interval)
+        log.info(f"⏳  Waiting for PR #{pr_number}... (mergeable_state='{mergeable_state}')")
+        if use_webhooks:
+            await webhooks.wait(owner, repo, pr_number, timeout - elapsed)
+        else:
+            await asyncio.sleep(poll_interval)
 
-def merge_pr(owner, repo, pr_number, pr_title, my_name, my_email, display_name):
+async def merge_pr(client, owner, repo, pr_number, pr_title, my_name, my_email, display_name):
     """
     Merges a Dependabot PR. If COUNT_MERGES_AS_PERSONAL_COMMITS is True,
     does a squash merge with a co-author line to potentially count as your commit.
     Otherwise, uses MERGE_METHOD without a co-author line.
+    Returns True if the PR was merged.
     """
     if COUNT_MERGES_AS_PERSONAL_COMMITS:
         final_method = "squash"
@@ -315,99 +842,251 @@ def merge_pr(owner, repo, pr_number, pr_title, my_name, my_email, display_name):
         commit_message = "Merging Dependabot changes."
 
     merge_url = f"{BASE_URL}/repos/{owner}/{repo}/pulls/{pr_number}/merge"
-    data = {
+    # Encoded once up front; GitHubClient.request resends these same bytes on retries.
+    body = orjson.dumps({
         "merge_method": final_method,
         "commit_title": commit_title,
         "commit_message": commit_message
-    }
-    resp = requests.put(merge_url, headers=HEADERS, json=data)
-    if resp.status_code == 200:
-        merge_info = resp.json()
+    })
+    resp = await client.request("PUT", merge_url, content=body, headers=JSON_HEADERS)
+    if resp.status_code == OK:
+        merge_info = orjson.loads(resp.content)
         if merge_info.get("merged"):
-            print(f"✔️  Successfully merged PR #{pr_number} in {display_name} via {final_method} merge.")
-        else:
-            print(f"❌  API responded but did not merge PR #{pr_number} in {display_name}: {merge_info}")
+            log.info(f"✔️  Successfully merged PR #{pr_number} in {display_name} via {final_method} merge.")
+            return True
+        log.error(f"❌  API responded but did not merge PR #{pr_number} in {display_name}: {merge_info}")
+    else:
+        log.error(f"❌  Merge API call failed for PR #{pr_number} in {display_name}: {resp.status_code} {resp.text}")
+    return False
+
+async def handle_dependabot_pr(client, owner, repo_name, pr, display_name, merge_lock, webhooks=None):
+    """
+    Decides whether a single Dependabot PR can be merged (polling via REST if its
+    merge state is not yet known) and merges it if so. Returns True if it was merged.
+    `merge_lock` is shared by the repo's PRs: merges into the same base branch must run
+    one at a time, or GitHub rejects them with "Base branch was modified".
+    """
+    pr_number = pr["number"]
+    pr_title = pr["title"]
+    log.info(f"\n=> Found Dependabot PR #{pr_number} in {display_name}: {pr_title}")
+
+    if any(conclusion in FAILING_CONCLUSIONS for conclusion in pr["conclusions"]):
+        log.error(f"❌  PR #{pr_number} has failing checks. Skipping merge.")
+        can_merge = False
+    elif pr["merge_state"] == "CLEAN":
+        log.info(f"✔️  PR #{pr_number} is mergeable (clean).")
+        can_merge = True
+    elif pr["merge_state"] == "BLOCKED" and not pr["checks_pending"]:
+        log.error(f"❌  PR #{pr_number} is blocked by branch protection (e.g. required reviews). Skipping merge.")
+        can_merge = False
     else:
-        print(f"❌  Merge API call failed for PR #{pr_number} in {display_name}: {resp.status_code} {resp.text}")
+        # Merge state is still being computed (or unknown), or the PR is blocked only
+        # until its required checks finish: poll via REST.
+        can_merge = await wait_for_mergeability(client, owner, repo_name, pr_number,
+                                                head_sha=pr["head_sha"],
+                                                timeout=TIMEOUT_SECONDS,
+                                                poll_interval=POLL_INTERVAL_SECONDS,
+                                                webhooks=webhooks)
+    if can_merge:
+        async with merge_lock:
+            return await merge_pr(client, owner, repo_name, pr_number, pr_title, MY_NAME, MY_EMAIL, display_name)
+    return False
 
-def step_merge_dependabot_prs(repos, excluded):
+async def step_merge_dependabot_prs(client, repos, excluded, sem, webhooks=None):
     """
     Finds and merges Dependabot PRs for each repo (if checks pass).
-    Repository names for private repos are masked.
-    """
-    print("\n=== STEP 3: MERGE DEPENDABOT PRs ===")
-    for r in repos:
-        display_name = safe_repo_name(r)
-        full_name = f"{r['owner']['login']}/{r['name']}"
-        if full_name in excluded:
-            print(f"Skipping Dependabot merges for {display_name} (excluded).")
-            continue
+    Repository names for private repos are masked. `sem` bounds how many repos are processed at once.
+    Returns the full names of the repos that still have unmerged Dependabot PRs.
+    """
+    repos_to_check = [r for r in repos if r.full_name not in excluded]
+    if len(repos_to_check) < len(repos):
+        log.info(f"Skipping Dependabot merges for {len(repos) - len(repos_to_check)} excluded repos.")
+
+    async def process_repo(r):
+        async with sem:
+            try:
+                return await merge_repo_prs(r)
+            except httpx.HTTPError as e:
+                # Counted as pending, so the repo is checked again next run.
+                log.error(f"❌  Failed to process Dependabot PRs in {r.display_name}: {e!r}")
+                return True
 
-        owner = r["owner"]["login"]
-        repo_name = r["name"]
-        print(f"\n[Checking Dependabot PRs in] {display_name}")
+    async def merge_repo_prs(r):
+        log.info(f"\n[Checking Dependabot PRs in] {r.display_name}")
 
-        open_prs = get_open_prs(owner, repo_name)
-        dependabot_prs = [pr for pr in open_prs if pr["user"]["login"] == "dependabot[bot]"]
+        dependabot_prs = await get_dependabot_prs(client, r.owner, r.name)
+        if dependabot_prs is None:
+            open_prs = await get_open_prs(client, r.owner, r.name)
+            dependabot_prs = [
+                {"number": pr["number"], "title": pr["title"], "merge_state": None,
+                 "head_sha": pr["head"]["sha"], "conclusions": [], "checks_pending": None}
+                for pr in open_prs if pr["user"]["login"] == "dependabot[bot]"
+            ]
 
         if not dependabot_prs:
-            print("No open Dependabot PRs.")
-            continue
+            log.info(f"No open Dependabot PRs in {r.display_name}.")
+            return False
 
-        for pr in dependabot_prs:
-            pr_number = pr["number"]
-            pr_title = pr["title"]
-            print(f"\n=> Found Dependabot PR #{pr_number}: {pr_title}")
+        pr_sem = asyncio.Semaphore(PR_CONCURRENCY_PER_REPO)
+        merge_lock = asyncio.Lock()
 
-            can_merge = wait_for_mergeability(owner, repo_name, pr_number,
-                                              timeout=TIMEOUT_SECONDS,
-                                              poll_interval=POLL_INTERVAL_SECONDS)
-            if can_merge:
-                merge_pr(owner, repo_name, pr_number, pr_title, MY_NAME, MY_EMAIL, display_name)
-            else:
-                print(f"Skipping PR #{pr_number} due to failing checks or timeout.")
+        async def handle_pr(pr):
+            async with pr_sem:
+                return await handle_dependabot_pr(client, r.owner, r.name, pr, r.display_name, merge_lock, webhooks)
+
+        # PRs of the same repo are polled concurrently, so one PR waiting for CI doesn't hold up
+        # the rest; the merges themselves are serialized by merge_lock.
+        merged = await asyncio.gather(*[handle_pr(pr) for pr in dependabot_prs])
+        return not all(merged)
+
+    results = await asyncio.gather(*[process_repo(r) for r in repos_to_check])
+    return {r.full_name for r, has_pending in zip(repos_to_check, results) if has_pending}
 
 # ============== MAIN ============== #
 
-def main():
-    print("=== STARTING SCRIPT ===")
+def load_state(file_path):
+    """
+    Reads the per-repo results of previous runs:
+    {state_key("owner/repo"): {"pushed_at", "last_processed", "security_updates_enabled", "pending_prs"}}.
+    """
+    return _load_json_file(file_path, "state file")
+
+def state_key(full_name):
+    """Repos are keyed by a hash of their name, so the state file doesn't reveal private repo names."""
+    return hashlib.sha256(full_name.encode()).hexdigest()
+
+def save_state(file_path, state):
+    _save_json_file(file_path, state, "state file")
+
+async def process_repos(client, repos, excluded, sem, state, webhooks=None):
+    """
+    Runs the enabled steps, in order, over one batch of repositories.
+    Steps 2 and 3 skip repos that haven't been pushed to since a run in which they
+    already succeeded; `state` is updated with this run's results.
+    """
+    # What each repo looked like at the end of the last run, taken before any step
+    # records this run's results (which would make every repo look unchanged).
+    previous = {r.full_name: dict(state.get(state_key(r.full_name), {})) for r in repos}
+
+    def unchanged_since_last_run(r):
+        last = previous[r.full_name]
+        return bool(last) and r.pushed_at is not None and last.get("pushed_at") == r.pushed_at
+
+    def record(r, **results):
+        if r.full_name in excluded:
+            return
+        entry = state.setdefault(state_key(r.full_name), {})
+        entry.update(results, pushed_at=r.pushed_at, last_processed=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+
+    # Forks are always synced: upstream changes don't show up in the fork's pushed_at.
+    if ENABLE_STEP_SYNC_FORKS:
+        await step_sync_forks(client, repos, excluded, sem)
+
+    if ENABLE_STEP_ENABLE_DEPENDABOT:
+        repos_to_enable = [
+            r for r in repos
+            if not (unchanged_since_last_run(r) and previous[r.full_name].get("security_updates_enabled"))
+        ]
+        if len(repos_to_enable) < len(repos):
+            log.info(f"Skipping Dependabot setup for {len(repos) - len(repos_to_enable)} repos unchanged since the last run.")
+        enabled = await step_enable_dependabot_security_updates(client, repos_to_enable, excluded, sem)
+        for r in repos_to_enable:
+            record(r, security_updates_enabled=r.full_name in enabled)
+
+    if ENABLE_STEP_MERGE_DEPENDABOT_PRS:
+        # New Dependabot PRs push a branch (changing pushed_at), but CI finishing doesn't,
+        # so repos that had unmerged PRs last time are always checked again.
+        repos_to_check = [
+            r for r in repos
+            if not (unchanged_since_last_run(r) and previous[r.full_name].get("pending_prs") is False)
+        ]
+        if len(repos_to_check) < len(repos):
+            log.info(f"Skipping Dependabot merges for {len(repos) - len(repos_to_check)} repos unchanged since the last run.")
+        pending = await step_merge_dependabot_prs(client, repos_to_check, excluded, sem, webhooks)
+        for r in repos_to_check:
+            record(r, pending_prs=r.full_name in pending)
+
+async def main():
+    log.info("=== STARTING SCRIPT ===")
     
     # 1) Load the exclusion list
     excluded_repos = load_excluded_repos(EXCLUDED_REPOS_FILE)
     if excluded_repos:
-        print("Excluding these repos:")
+        log.info("Excluding these repos:")
         for er in excluded_repos:
-            print(f"  - {er}")
+            log.info(f"  - {er}")
     
     # 2) Load the inclusion list
-    included_repos = load_included_repos("included_repos.txt")
+    included_repos = load_included_repos(INCLUDED_REPOS_FILE)
     if included_repos:
-        print("Including only these repos:")
+        log.info("Including only these repos:")
         for ir in included_repos:
-            print(f"  - {ir}")
-    
-    # 3) List Repos
-    repos = list_repos()
-    print(f"\nFound {len(repos)} repos with push access (USER_MODE={USER_MODE}).")
-    
-    # 4) Filter repos by the inclusion list if it is provided
-    if included_repos:
-        repos = [r for r in repos if f"{r['owner']['login']}/{r['name']}" in included_repos]
-        print(f"After inclusion filtering, {len(repos)} repos remain.")
-    
-    # 5) Step 1: Sync Forks
-    if ENABLE_STEP_SYNC_FORKS:
-        step_sync_forks(repos, excluded_repos)
-    
-    # 6) Step 2: Enable Dependabot Security Updates
-    if ENABLE_STEP_ENABLE_DEPENDABOT:
-        step_enable_dependabot_security_updates(repos, excluded_repos)
+            log.info(f"  - {ir}")
     
-    # 7) Step 3: Merge Dependabot PRs
-    if ENABLE_STEP_MERGE_DEPENDABOT_PRS:
-        step_merge_dependabot_prs(repos, excluded_repos)
+    # A single HTTP/2 client (with the Authorization header set once) is shared by every
+    # step, so concurrent requests are multiplexed over one connection instead of each
+    # opening their own.
+    limits = httpx.Limits(max_connections=MAX_CONCURRENCY,
+                          max_keepalive_connections=MAX_CONCURRENCY,
+                          keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS)
+    async with httpx.AsyncClient(http2=True, headers=HEADERS, limits=limits, timeout=HTTP_TIMEOUT_SECONDS) as http_client:
+        client = GitHubClient(http_client, etag_cache_file=ETAG_CACHE_FILE)
+
+        log.info("\n=== RUNNING STEPS ===")
+        if ENABLE_STEP_SYNC_FORKS:
+            log.info("STEP 1: SYNC FORKS")
+        if ENABLE_STEP_ENABLE_DEPENDABOT:
+            log.info("STEP 2: ENABLE DEPENDABOT SECURITY UPDATES")
+        if ENABLE_STEP_MERGE_DEPENDABOT_PRS:
+            log.info("STEP 3: MERGE DEPENDABOT PRs")
+
+        state = load_state(STATE_FILE)
+        webhooks = None
+        if WEBHOOK_URL and ENABLE_STEP_MERGE_DEPENDABOT_PRS:
+            try:
+                webhooks = WebhookListener(client, WEBHOOK_URL, WEBHOOK_PORT)
+            except ImportError:
+                log.error("WEBHOOK_URL is set but aiohttp is not installed (pip install aiohttp). Falling back to polling.")
+            else:
+                await webhooks.start()
+
+        batches = []
+        try:
+            # 3) List repos page by page; each page goes through the steps as soon as it
+            #    arrives, while the remaining pages are still being fetched.
+            sem = asyncio.Semaphore(MAX_CONCURRENCY)
+            found_count = 0
+            kept_count = 0
+            async for repos in iter_repos(client):
+                found_count += len(repos)
+
+                # 4) Filter repos by the inclusion list if it is provided
+                if included_repos:
+                    repos = [r for r in repos if r.full_name in included_repos]
+                kept_count += len(repos)
+
+                # 5) Steps 1-3: Sync Forks, Enable Dependabot Security Updates, Merge Dependabot PRs
+                batches.append(asyncio.create_task(process_repos(client, repos, excluded_repos, sem, state, webhooks)))
+
+            log.info(f"\nFound {found_count} repos with push access (USER_MODE={USER_MODE}).")
+            if included_repos:
+                log.info(f"After inclusion filtering, {kept_count} repos remain.")
+
+            await asyncio.gather(*batches)
+        finally:
+            # On an error, stop the remaining batches first so none of them registers
+            # a new webhook while the hooks are being removed.
+            for task in batches:
+                task.cancel()
+            await asyncio.gather(*batches, return_exceptions=True)
+            # Always remove the temporary webhooks, even if a step failed.
+            if webhooks:
+                await webhooks.stop()
+
+        client.save_etags()
+        save_state(STATE_FILE, state)
     
-    print("=== ALL STEPS COMPLETED ===")
+    log.info("=== ALL STEPS COMPLETED ===")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+"""
+Loads dependency-fix.py (whose name isn't importable) once, for all test modules.
+"""
+
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("MY_GITHUB_TOKEN", "test-token")
+
+dependency_fix = sys.modules.get("dependency_fix")
+if dependency_fix is None:
+    _spec = importlib.util.spec_from_file_location(
+        "dependency_fix", Path(__file__).resolve().parent.parent / "dependency-fix.py"
+    )
+    dependency_fix = importlib.util.module_from_spec(_spec)
+    sys.modules["dependency_fix"] = dependency_fix
+    _spec.loader.exec_module(dependency_fix)
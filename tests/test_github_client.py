@@ -0,0 +1,113 @@
+"""
+Tests for GitHubClient.request(): retries, backoff and the rate-limit pause.
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import time
+import unittest
+
+import httpx
+
+from support import dependency_fix
+
+
+class GitHubClientRetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+        original = dependency_fix.RETRY_BACKOFF_SECONDS
+        dependency_fix.RETRY_BACKOFF_SECONDS = (0, 0, 0)
+        self.addCleanup(setattr, dependency_fix, "RETRY_BACKOFF_SECONDS", original)
+
+    def run_client(self, handler, scenario):
+        """Runs `scenario(client)` against a GitHubClient whose transport is `handler`."""
+        async def recording_handler(request):
+            self.requests.append((request.method, request.url.path, time.monotonic()))
+            result = handler(request)
+            return await result if asyncio.iscoroutine(result) else result
+
+        async def run():
+            transport = httpx.MockTransport(recording_handler)
+            async with httpx.AsyncClient(transport=transport) as http_client:
+                return await scenario(dependency_fix.GitHubClient(http_client))
+        return asyncio.run(run())
+
+    def responses(self, *responses):
+        """A handler returning `responses` in order (repeating the last one)."""
+        responses = list(responses)
+        return lambda request: responses.pop(0) if len(responses) > 1 else responses[0]
+
+    def test_server_error_on_get_is_retried(self):
+        handler = self.responses(httpx.Response(502), httpx.Response(200, json={}))
+        resp = self.run_client(handler, lambda client: client.request("GET", "https://api.test/repos"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_server_error_on_merge_is_not_retried(self):
+        handler = self.responses(httpx.Response(502), httpx.Response(200, json={"merged": True}))
+        resp = self.run_client(handler, lambda client: client.request("PUT", "https://api.test/pulls/1/merge"))
+        self.assertEqual(resp.status_code, 502)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_server_error_on_idempotent_put_is_retried(self):
+        handler = self.responses(httpx.Response(502), httpx.Response(204))
+        resp = self.run_client(
+            handler, lambda client: client.request("PUT", "https://api.test/vulnerability-alerts", idempotent=True)
+        )
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_connection_error_is_retried_for_any_method(self):
+        attempts = []
+
+        def handler(request):
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise httpx.ConnectError("connection refused")
+            return httpx.Response(200, json={"merged": True})
+
+        resp = self.run_client(handler, lambda client: client.request("PUT", "https://api.test/pulls/1/merge"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(attempts), 2)
+
+    def test_read_timeout_on_merge_is_not_retried(self):
+        def handler(request):
+            raise httpx.ReadTimeout("timed out")
+
+        with self.assertRaises(httpx.ReadTimeout):
+            self.run_client(handler, lambda client: client.request("PUT", "https://api.test/pulls/1/merge"))
+        self.assertEqual(len(self.requests), 1)
+
+    def test_secondary_rate_limit_is_retried(self):
+        handler = self.responses(
+            httpx.Response(403, text="You have exceeded a secondary rate limit."),
+            httpx.Response(204)
+        )
+        resp = self.run_client(handler, lambda client: client.request("PUT", "https://api.test/pulls/1/merge"))
+        self.assertEqual(resp.status_code, 204)
+        self.assertEqual(len(self.requests), 2)
+
+    def test_retry_after_pauses_other_requests(self):
+        limited = []
+
+        def handler(request):
+            if request.url.path == "/limited" and not limited:
+                limited.append(time.monotonic())
+                return httpx.Response(429, headers={"Retry-After": "1"})
+            return httpx.Response(200, json={})
+
+        async def scenario(client):
+            first = asyncio.create_task(client.request("GET", "https://api.test/limited"))
+            await asyncio.sleep(0.1)
+            other = await client.request("GET", "https://api.test/other")
+            return await first, other
+
+        limited_resp, other_resp = self.run_client(handler, scenario)
+        self.assertEqual((limited_resp.status_code, other_resp.status_code), (200, 200))
+        other_sent_at = next(t for method, path, t in self.requests if path == "/other")
+        self.assertGreaterEqual(other_sent_at - limited[0], 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for the skip logic in process_repos(): which repos steps 2 and 3 see across runs.
+Run with: python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+
+from support import dependency_fix
+
+
+def make_repo(name, pushed_at):
+    return dependency_fix.RepoRec(
+        full_name=f"owner/{name}", owner="owner", name=name, fork=False,
+        default_branch="main", parent_url=None, private=False,
+        display_name=f"owner/{name}", pushed_at=pushed_at
+    )
+
+
+class ProcessReposSkipTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.pending = set()
+
+        async def enable(client, repos, excluded, sem):
+            self.calls.append(("enable", sorted(r.name for r in repos)))
+            return {r.full_name for r in repos}
+
+        async def merge(client, repos, excluded, sem, webhooks=None):
+            self.calls.append(("merge", sorted(r.name for r in repos)))
+            return {r.full_name for r in repos if r.name in self.pending}
+
+        patches = {
+            "ENABLE_STEP_SYNC_FORKS": False,
+            "ENABLE_STEP_ENABLE_DEPENDABOT": True,
+            "ENABLE_STEP_MERGE_DEPENDABOT_PRS": True,
+            "step_enable_dependabot_security_updates": enable,
+            "step_merge_dependabot_prs": merge,
+        }
+        for attr, value in patches.items():
+            original = getattr(dependency_fix, attr)
+            setattr(dependency_fix, attr, value)
+            self.addCleanup(setattr, dependency_fix, attr, original)
+
+    def run_once(self, state, repos):
+        self.calls.clear()
+        asyncio.run(dependency_fix.process_repos(None, repos, frozenset(), None, state))
+        return dict(self.calls)
+
+    def test_unchanged_repos_are_skipped(self):
+        state = {}
+        self.run_once(state, [make_repo("a", "T1")])
+        calls = self.run_once(state, [make_repo("a", "T1")])
+        self.assertEqual(calls, {"enable": [], "merge": []})
+
+    def test_pushed_repo_is_checked_again_by_every_step(self):
+        state = {}
+        self.run_once(state, [make_repo("a", "T1"), make_repo("b", "T1")])
+        calls = self.run_once(state, [make_repo("a", "T2"), make_repo("b", "T1")])
+        self.assertEqual(calls, {"enable": ["a"], "merge": ["a"]})
+
+    def test_repo_with_pending_prs_is_checked_again(self):
+        state = {}
+        self.pending = {"a"}
+        self.run_once(state, [make_repo("a", "T1")])
+        calls = self.run_once(state, [make_repo("a", "T1")])
+        self.assertEqual(calls, {"enable": [], "merge": ["a"]})
+
+    def test_new_repo_without_pushed_at_is_processed(self):
+        calls = self.run_once({}, [make_repo("a", None)])
+        self.assertEqual(calls, {"enable": ["a"], "merge": ["a"]})
+
+    def test_state_does_not_contain_repo_names(self):
+        state = {}
+        self.run_once(state, [make_repo("secret-repo", "T1")])
+        self.assertNotIn("secret-repo", repr(state))
+
+
+if __name__ == "__main__":
+    unittest.main()